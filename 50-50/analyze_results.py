@@ -1,7 +1,39 @@
+import logging
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from lxml import etree
 from pathlib import Path
 from typing import Optional
 
+# The id-classification helpers are shared by all scenario variants and
+# live one level up (the variant folder names contain spaces, so a plain
+# path insert replaces a package import)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from analysis_helpers import (
+    GROUP_LABELS,
+    GROUP_RE,
+    HUB_LABELS,
+    HUB_RE,
+    classify_vehicle,
+    hub_from_id,
+    powertrain_from_vtype,
+)
+
+# Optional: numba fuses the fine-grain aggregation into a single
+# compiled pass over one numeric matrix; pandas is the fallback.
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
 # ---------------------------------------------------------
 # CONFIG
 # ---------------------------------------------------------
@@ -26,8 +58,34 @@ def load_tripinfo_with_emissions(path: Path) -> pd.DataFrame:
     """
     Load tripinfo.xml and join the <emissions> child data.
     Returns one row per vehicle with travel + emissions info.
+
+    Streams the file with lxml's iterparse instead of parsing the full
+    tree twice with pd.read_xml: each <tripinfo> and its inline
+    <emissions> child are collected together in one pass, and processed
+    elements are freed immediately so memory stays flat on big files.
+
+    The parsed table is cached next to the XML as Parquet, keyed by the
+    file's mtime and size, so repeated runs during report iteration skip
+    the XML parse entirely.
     """
-    trip = pd.read_xml(path, xpath=".//tripinfo")
+    stat = path.stat()
+    cache = path.with_suffix(f".{stat.st_mtime_ns}.{stat.st_size}.parquet")
+    if cache.exists():
+        return pd.read_parquet(cache, engine="pyarrow")
+
+    trip_rows = []
+    em_rows = []
+    for _, elem in etree.iterparse(str(path), events=("end",), tag="tripinfo"):
+        trip_rows.append(dict(elem.attrib))
+        em = elem.find("emissions")
+        em_rows.append(dict(em.attrib) if em is not None else {})
+        # free this element and any already-handled siblings
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+    trip = pd.DataFrame(trip_rows)
+    em = pd.DataFrame(em_rows)
 
     # Normalize some expected columns if missing
     if "id" not in trip.columns:
@@ -39,8 +97,7 @@ def load_tripinfo_with_emissions(path: Path) -> pd.DataFrame:
     if "vType" not in trip.columns:
         trip["vType"] = trip.get("type", pd.NA)
 
-    em = pd.read_xml(path, xpath=".//emissions")
-    # If emissions rows mismatch count, align by index order (SUMO writes one child per tripinfo)
+    # Rows are already aligned by construction (one emissions dict per tripinfo)
     df = trip.join(em, how="left", lsuffix="", rsuffix="_em")
 
     # Standardize common emission columns if they exist
@@ -49,13 +106,48 @@ def load_tripinfo_with_emissions(path: Path) -> pd.DataFrame:
         if col not in df.columns:
             df[col] = 0.0
 
+    # XML attributes arrive as strings; restore numeric dtypes the way
+    # pd.read_xml would have inferred them
+    for c in df.columns:
+        converted = pd.to_numeric(df[c], errors="coerce")
+        if converted.notna().any():
+            df[c] = converted
+
+    df.to_parquet(cache, engine="pyarrow", compression="zstd")
     return df
 
 
+def write_csv(df: pd.DataFrame, path: Path) -> None:
+    """Write a DataFrame as CSV through Arrow's vectorized C++ writer
+    (much faster than DataFrame.to_csv for the big detailed tables)."""
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), str(path))
+
+
+def print_summary(title: str, summary: pd.DataFrame) -> None:
+    """
+    Print a summary table. Float columns are formatted once per cell
+    up front (to_string's float_format lambda gets re-run during column
+    width passes) and the whole block is skipped when INFO logging is
+    disabled, so batch runs pay nothing for it.
+    """
+    if not logging.getLogger().isEnabledFor(logging.INFO):
+        return
+    float_cols = [c for c in summary.columns if summary[c].dtype.kind == "f"]
+    fmt = summary.assign(
+        **{c: summary[c].map("{:,.3f}".format, na_action="ignore") for c in float_cols}
+    )
+    print(f"\n=== {title} ===")
+    print(fmt.to_string(index=False))
+
+
 def load_battery_totals(path: Path) -> Optional[pd.DataFrame]:
     """
     Load battery.xml and return a per-vehicle total energy table.
-    This function is defensive: it tries multiple common battery-output shapes.
+    This function is defensive: it tries multiple common attribute names.
+
+    Streams the <vehicle> timestep rows with iterparse and accumulates
+    sums into a dict keyed by vehicle id, so memory is O(vehicles)
+    instead of one DataFrame row per timestep.
 
     Assumptions:
       - Energy values are in Wh (consistent with SUMO battery 'capacity' unit).
@@ -64,211 +156,299 @@ def load_battery_totals(path: Path) -> Optional[pd.DataFrame]:
     if not path.exists():
         return None
 
-    # Try the most common shapes:
-    energy_rows = []
-
+    totals = defaultdict(float)
     try:
-        # Shape A: nested vehicles under timesteps
-        # Read all <vehicle> nodes anywhere
-        vdf = pd.read_xml(path, xpath=".//vehicle")
-        if not vdf.empty:
-            # Harmonize id column name
-            if "id" not in vdf.columns:
-                id_col = next((c for c in vdf.columns if c.lower() in ("vehicle", "vehid", "name")), None)
-                if id_col:
-                    vdf = vdf.rename(columns={id_col: "id"})
-            # Collect any numeric energy columns we recognize
-            energy_cols = [c for c in vdf.columns if c.lower() in
-                           ("energyconsumed", "totalenergyconsumed", "chargingenergy", "dischargingenergy", "energy")]
-            # Keep only what's numeric
-            for c in energy_cols:
-                vdf[c] = pd.to_numeric(vdf[c], errors="coerce")
-            if "id" in vdf.columns and energy_cols:
-                agg = vdf.groupby("id")[energy_cols].sum(min_count=1).reset_index()
-                # Prioritize the most direct "consumed" measure
-                if "energyConsumed" in agg.columns:
-                    agg["energy_Wh"] = agg["energyConsumed"]
-                elif "totalEnergyConsumed" in agg.columns:
-                    agg["energy_Wh"] = agg["totalEnergyConsumed"]
-                elif "energy" in agg.columns:
-                    agg["energy_Wh"] = agg["energy"]
-                else:
-                    # As a fallback, sum all known columns into a generic energy (may overcount charging)
-                    agg["energy_Wh"] = agg[energy_cols].sum(axis=1, min_count=1)
-                energy_rows.append(agg[["id", "energy_Wh"]])
-    except Exception:
+        for _, elem in etree.iterparse(str(path), events=("end",), tag="vehicle"):
+            a = elem.attrib
+            vid = a.get("id") or a.get("vehicle") or a.get("name")
+            val = a.get("energyConsumed") or a.get("totalEnergyConsumed") or a.get("energy")
+            if vid and val is not None:
+                try:
+                    totals[vid] += float(val)
+                except ValueError:
+                    pass
+            # free this element and any already-handled siblings
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+    except etree.XMLSyntaxError:
+        # truncated/garbled file: keep whatever was accumulated so far
         pass
 
-    if not energy_rows:
+    if not totals:
         return None
 
-    out = pd.concat(energy_rows, ignore_index=True)
-    out = out.groupby("id", as_index=False)["energy_Wh"].sum(min_count=1)
-    return out
+    return pd.DataFrame({"id": list(totals), "energy_Wh": list(totals.values())})
 
 
-def classify_vehicle(veh_id: str) -> str:
-    """
-    Assign each vehicle to a group based on its id prefix.
-    """
-    if veh_id.startswith("T_"):
-        return "logistics_truck"
-    if veh_id.startswith("bgt_"):
-        return "background_truck"
-    if veh_id.startswith("bgc_") or veh_id.startswith("F_"):
-        return "background_car"
-    return "other"
+if HAVE_NUMBA:
+    @njit(cache=True)
+    def _group_sum_count(codes, X, ngroups):
+        """Per-group sums and non-NaN counts of X in one fused traversal."""
+        K = X.shape[1]
+        sums = np.zeros((ngroups, K))
+        cnts = np.zeros((ngroups, K), dtype=np.int64)
+        for i in range(X.shape[0]):
+            g = codes[i]
+            for k in range(K):
+                v = X[i, k]
+                if v == v:  # not NaN
+                    sums[g, k] += v
+                    cnts[g, k] += 1
+        return sums, cnts
 
 
-def hub_from_id(veh_id: str) -> str:
-    """
-    Map logistics truck IDs to their hub.
-    """
-    if veh_id.startswith("T_SPAR"):
-        return "SPAR"
-    if veh_id.startswith("T_UCS"):
-        return "UCS"
-    if veh_id.startswith("T_TGW"):
-        return "TGW"
-    if veh_id.startswith("T_ROS2"):
-        return "Roswell2"
-    if veh_id.startswith("T_ROS34"):
-        return "Roswell3&4"
-    return "other"
-
-
-def powertrain_from_vtype(vtype: str) -> str:
+def aggregate_fine(df: pd.DataFrame, mean_cols: list, sum_cols: list) -> pd.DataFrame:
     """
-    EV vs Diesel based on vType id.
+    Sums and non-NaN counts per (vehicle_group, powertrain, hub) cell.
+
+    The three category code arrays are combined into one integer code
+    per row; with numba installed a compiled kernel accumulates all
+    columns in a single pass, otherwise the rows are sorted by code once
+    and each column is reduced with np.add.reduceat. Neither path goes
+    through pandas groupby dispatch.
     """
-    if pd.isna(vtype):
-        return "unknown"
-    if vtype in EV_TYPES:
-        return "EV"
-    if vtype in DIESEL_TYPES:
-        return "Diesel"
-    # simple heuristic: treat 'ev' substring as EV
-    return "EV" if "ev" in str(vtype).lower() else "Other"
+    val_cols = list(dict.fromkeys(mean_cols + sum_cols))
+    g = df["vehicle_group"].cat
+    p = df["powertrain"].cat
+    h = df["hub"].cat
+    n_p, n_h = len(p.categories), len(h.categories)
+    codes = (
+        g.codes.to_numpy().astype(np.int64) * n_p + p.codes.to_numpy()
+    ) * n_h + h.codes.to_numpy()
+    ngroups = len(g.categories) * n_p * n_h
+    n_vehicles = np.bincount(codes, minlength=ngroups)
+    observed = np.nonzero(n_vehicles > 0)[0]
+
+    if HAVE_NUMBA:
+        X = np.ascontiguousarray(np.column_stack(
+            [df[c].to_numpy(dtype="float64", na_value=np.nan) for c in val_cols]
+        ))
+        sums, cnts = _group_sum_count(codes, X, ngroups)
+        sums, cnts = sums[observed], cnts[observed]
+    else:
+        # one stable sort by code, then a C-level segmented reduction
+        # per column (sums over non-NaN values plus non-NaN counts)
+        order = np.argsort(codes, kind="stable")
+        starts = np.r_[0, np.nonzero(np.diff(codes[order]))[0] + 1]
+        sums = np.empty((len(observed), len(val_cols)))
+        cnts = np.empty((len(observed), len(val_cols)), dtype=np.int64)
+        for k, c in enumerate(val_cols):
+            col = df[c].to_numpy(dtype="float64", na_value=np.nan)[order]
+            sums[:, k] = np.add.reduceat(np.nan_to_num(col), starts)
+            cnts[:, k] = np.add.reduceat((~np.isnan(col)).astype(np.int64), starts)
+
+    index = pd.MultiIndex.from_arrays(
+        [
+            pd.Categorical.from_codes(observed // (n_p * n_h), g.categories),
+            pd.Categorical.from_codes((observed // n_h) % n_p, p.categories),
+            pd.Categorical.from_codes(observed % n_h, h.categories),
+        ],
+        names=["vehicle_group", "powertrain", "hub"],
+    )
+    data = {"n_vehicles": n_vehicles[observed]}
+    for k, c in enumerate(val_cols):
+        data[f"{c}_sum"] = sums[:, k]
+        if c in mean_cols:
+            data[f"{c}_cnt"] = cnts[:, k]
+    return pd.DataFrame(data, index=index)
 
 
 # ---------------------------------------------------------
 # MAIN ANALYSIS
 # ---------------------------------------------------------
 def main():
-    # --- trip + emissions ---
-    df = load_tripinfo_with_emissions(TRIPINFO_PATH)
+    # --- trip + emissions / battery ---
+    # Two independent files; parse them in parallel (lxml releases the
+    # GIL while parsing, and the pool costs nothing if battery.xml is
+    # missing).
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        f_trip = ex.submit(load_tripinfo_with_emissions, TRIPINFO_PATH)
+        f_bat = ex.submit(load_battery_totals, BATTERY_PATH)
+        df = f_trip.result()
+        bat = f_bat.result()
+
+    # Arrow-backed strings: groupby/startswith work on dictionary codes
+    # instead of per-cell Python objects
+    df["id"] = df["id"].astype("string[pyarrow]")
+    if "vType" in df.columns:
+        df["vType"] = df["vType"].astype("string[pyarrow]")
+
+    # Basic metrics (vectorized prefix tests instead of a per-row .apply)
+    ids = df["id"]
+    df["vehicle_group"] = (
+        ids.str.extract(GROUP_RE, expand=False)
+        .map(GROUP_LABELS)
+        .fillna("other")
+        .astype("category")
+    )
+
+    # Hub, precomputed for every row ("other" for non-logistics traffic)
+    # so all the summaries below can share a single grouping pass
+    df["hub"] = (
+        ids.str.extract(HUB_RE, expand=False)
+        .map(HUB_LABELS)
+        .fillna("other")
+        .astype("category")
+    )
+
+    # Unit conversions (HBEFA absolute values are mg): coerce each raw
+    # column to a float64 array exactly once and derive everything from it
+    def col(name: str) -> np.ndarray:
+        """Raw column as a float64 array (zeros when the attribute is absent)."""
+        if name in df.columns:
+            return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        return np.zeros(len(df), dtype="float64")
 
-    # Basic metrics
-    df["vehicle_group"] = df["id"].apply(classify_vehicle)
-    df["distance_km"] = pd.to_numeric(df.get("routeLength", 0), errors="coerce") / 1000.0
-    df["travel_time_min"] = pd.to_numeric(df.get("duration", 0), errors="coerce") / 60.0
+    co2 = col("CO2_abs")
+    fuel = col("fuel_abs")
+    dur = col("duration")
+    route = col("routeLength")
 
-    # Emissions & fuel (HBEFA absolute mg -> g / kg)
-    df["CO2_g"] = pd.to_numeric(df.get("CO2_abs", 0), errors="coerce") / 1000.0
-    df["CO2_kg"] = pd.to_numeric(df.get("CO2_abs", 0), errors="coerce") / 1_000_000.0
-    df["fuel_g"] = pd.to_numeric(df.get("fuel_abs", 0), errors="coerce") / 1000.0
-    df["fuel_kg"] = pd.to_numeric(df.get("fuel_abs", 0), errors="coerce") / 1_000_000.0
+    dist_km = route / 1000.0
+    df["distance_km"] = dist_km
+    df["travel_time_min"] = dur / 60.0
+
+    df["CO2_g"] = co2 / 1000.0
+    df["CO2_kg"] = co2 / 1_000_000.0
+    df["fuel_g"] = fuel / 1000.0
+    df["fuel_kg"] = fuel / 1_000_000.0
 
     # Per-km metrics (avoid /0)
-    dist_km_nz = df["distance_km"].replace(0, pd.NA)
-    df["CO2_kg_per_km"] = df["CO2_kg"] / dist_km_nz
-    df["fuel_kg_per_km"] = df["fuel_kg"] / dist_km_nz
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["CO2_kg_per_km"] = np.where(dist_km > 0, co2 / 1_000_000.0 / dist_km, np.nan)
+        df["fuel_kg_per_km"] = np.where(dist_km > 0, fuel / 1_000_000.0 / dist_km, np.nan)
 
     # Service / discharge time:
     df["service_time_s"] = 0.0
     df.loc[df["vehicle_group"] == "logistics_truck", "service_time_s"] = SERVICE_TIME_PER_TRUCK_S
-    df["driving_time_min"] = (pd.to_numeric(df.get("duration", 0), errors="coerce") - df["service_time_s"]) / 60.0
-
-    # Powertrain detection from vType
-    df["powertrain"] = df["vType"].apply(powertrain_from_vtype)
+    df["driving_time_min"] = (dur - df["service_time_s"].to_numpy()) / 60.0
+
+    # Powertrain detection from vType (vectorized equivalent of powertrain_from_vtype)
+    vt = df["vType"]
+    df["powertrain"] = pd.Categorical(np.select(
+        [
+            vt.isna(),
+            vt.isin(list(EV_TYPES)),
+            vt.isin(list(DIESEL_TYPES)),
+            vt.str.contains("ev", case=False, na=False),
+        ],
+        ["unknown", "EV", "Diesel", "EV"],
+        default="Other",
+    ))
 
     # --- battery (energy) ---
-    bat = load_battery_totals(BATTERY_PATH)
     if bat is not None and not bat.empty:
-        # Merge energy (Wh) -> kWh
-        df = df.merge(bat.rename(columns={"id": "id"}), on="id", how="left")
-        df["energy_Wh"] = pd.to_numeric(df["energy_Wh"], errors="coerce")
-        df["energy_kWh"] = df["energy_Wh"] / 1000.0
+        # Energy (Wh) -> kWh. A single-column lookup through an
+        # id-indexed Series; no need for the full merge machinery
+        energy_series = bat.set_index("id")["energy_Wh"]
+        df["energy_Wh"] = pd.to_numeric(df["id"].map(energy_series), errors="coerce")
+        df["energy_kWh"] = df["energy_Wh"].to_numpy(dtype="float64", na_value=np.nan) / 1000.0
     else:
-        df["energy_kWh"] = pd.NA
-
-    # Indirect CO2 for EVs only
-    df["indirect_CO2_kg"] = 0.0
-    ev_mask = df["powertrain"].eq("EV") & df["energy_kWh"].notna()
-    df.loc[ev_mask, "indirect_CO2_kg"] = df.loc[ev_mask, "energy_kWh"] * GRID_CO2_KG_PER_KWH
+        df["energy_kWh"] = np.nan
+
+    # Indirect CO2 for EVs only: one fused vectorized pass instead of
+    # boolean-masked .loc writes (which allocate two temporaries)
+    energy_kwh = df["energy_kWh"].to_numpy(dtype="float64", na_value=np.nan)
+    ev_mask = df["powertrain"].to_numpy() == "EV"
+    df["indirect_CO2_kg"] = np.where(
+        ev_mask & ~np.isnan(energy_kwh), energy_kwh * GRID_CO2_KG_PER_KWH, 0.0
+    )
 
     # Combined CO2: tailpipe (HBEFA) + indirect from electricity
-    df["total_CO2_kg_combined"] = df["CO2_kg"].fillna(0) + df["indirect_CO2_kg"].fillna(0)
+    df["total_CO2_kg_combined"] = (
+        np.nan_to_num(co2 / 1_000_000.0) + df["indirect_CO2_kg"].to_numpy()
+    )
+
+    # Derived metrics easily fit in float32 (SUMO precision is far
+    # below float64); halves the bytes every later pass moves
+    num_cols = [
+        "distance_km", "travel_time_min", "driving_time_min",
+        "CO2_g", "CO2_kg", "fuel_g",
+        "fuel_kg", "CO2_kg_per_km", "fuel_kg_per_km",
+        "energy_kWh", "indirect_CO2_kg", "total_CO2_kg_combined",
+    ]
+    df[num_cols] = df[num_cols].astype("float32")
 
     # -----------------------------------------------------
-    # Summary by vehicle group
+    # Summaries: one fine-grain grouping pass over the data
     # -----------------------------------------------------
-    group_summary = (
-        df.groupby("vehicle_group", dropna=False)
-        .agg(
-            n_vehicles=("id", "count"),
-            mean_travel_time_min=("travel_time_min", "mean"),
-            mean_driving_time_min=("driving_time_min", "mean"),
-            mean_distance_km=("distance_km", "mean"),
-            tailpipe_CO2_kg=("CO2_kg", "sum"),
-            indirect_CO2_kg=("indirect_CO2_kg", "sum"),
-            combined_CO2_kg=("total_CO2_kg_combined", "sum"),
-            mean_CO2_kg=("CO2_kg", "mean"),
-            mean_CO2_kg_per_km=("CO2_kg_per_km", "mean"),
-            mean_energy_kWh=("energy_kWh", "mean"),
-            total_energy_kWh=("energy_kWh", "sum"),
-        )
-        .reset_index()
-    )
+    # Sums and non-NaN counts per (group, powertrain, hub) cell; every
+    # summary table below is a cheap rollup of this small frame instead
+    # of another full pass over the vehicle rows. Means cannot be
+    # averaged across cells, so they are rebuilt as sum / count.
+    mean_cols = ["travel_time_min", "driving_time_min", "distance_km",
+                 "CO2_kg", "CO2_kg_per_km", "energy_kWh"]
+    sum_cols = ["CO2_kg", "indirect_CO2_kg", "total_CO2_kg_combined", "energy_kWh"]
+    fine = aggregate_fine(df, mean_cols, sum_cols)
+
+    def rollup(cells, levels, spec):
+        """
+        Aggregate fine-grain cells up to `levels`. `spec` maps output
+        columns to ("sum" | "mean", source column); means are rebuilt
+        from the per-cell sums and counts.
+        """
+        cells = cells.groupby(level=levels, observed=True, sort=False).sum()
+        out = pd.DataFrame(index=cells.index)
+        out["n_vehicles"] = cells["n_vehicles"]
+        for name, (how, col) in spec.items():
+            if how == "sum":
+                out[name] = cells[f"{col}_sum"]
+            else:
+                out[name] = cells[f"{col}_sum"] / cells[f"{col}_cnt"]
+        return out.reset_index().sort_values(levels, ignore_index=True)
 
-    print("\n=== Summary by vehicle group ===")
-    print(group_summary.to_string(index=False, float_format=lambda x: f"{x:,.3f}"))
+    # -----------------------------------------------------
+    # Summary by vehicle group
+    # -----------------------------------------------------
+    group_summary = rollup(fine, "vehicle_group", {
+        "mean_travel_time_min": ("mean", "travel_time_min"),
+        "mean_driving_time_min": ("mean", "driving_time_min"),
+        "mean_distance_km": ("mean", "distance_km"),
+        "tailpipe_CO2_kg": ("sum", "CO2_kg"),
+        "indirect_CO2_kg": ("sum", "indirect_CO2_kg"),
+        "combined_CO2_kg": ("sum", "total_CO2_kg_combined"),
+        "mean_CO2_kg": ("mean", "CO2_kg"),
+        "mean_CO2_kg_per_km": ("mean", "CO2_kg_per_km"),
+        "mean_energy_kWh": ("mean", "energy_kWh"),
+        "total_energy_kWh": ("sum", "energy_kWh"),
+    })
+
+    print_summary("Summary by vehicle group", group_summary)
 
     # -----------------------------------------------------
     # Split by group *and* powertrain (shows EV vs Diesel)
     # -----------------------------------------------------
-    gp_pt_summary = (
-        df.groupby(["vehicle_group", "powertrain"], dropna=False)
-        .agg(
-            n_vehicles=("id", "count"),
-            mean_distance_km=("distance_km", "mean"),
-            tailpipe_CO2_kg=("CO2_kg", "sum"),
-            indirect_CO2_kg=("indirect_CO2_kg", "sum"),
-            combined_CO2_kg=("total_CO2_kg_combined", "sum"),
-            total_energy_kWh=("energy_kWh", "sum"),
-        )
-        .reset_index()
-        .sort_values(["vehicle_group", "powertrain"])
-    )
+    gp_pt_summary = rollup(fine, ["vehicle_group", "powertrain"], {
+        "mean_distance_km": ("mean", "distance_km"),
+        "tailpipe_CO2_kg": ("sum", "CO2_kg"),
+        "indirect_CO2_kg": ("sum", "indirect_CO2_kg"),
+        "combined_CO2_kg": ("sum", "total_CO2_kg_combined"),
+        "total_energy_kWh": ("sum", "energy_kWh"),
+    })
 
-    print("\n=== By group & powertrain ===")
-    print(gp_pt_summary.to_string(index=False, float_format=lambda x: f"{x:,.3f}"))
+    print_summary("By group & powertrain", gp_pt_summary)
 
     # -----------------------------------------------------
     # Logistics trucks by hub (keeps powertrain columns too)
     # -----------------------------------------------------
-    trucks = df[df["vehicle_group"] == "logistics_truck"].copy()
+    trucks = df.loc[df["vehicle_group"].eq("logistics_truck").to_numpy()]
     if not trucks.empty:
-        trucks["hub"] = trucks["id"].apply(hub_from_id)
-
-        hub_summary = (
-            trucks.groupby(["hub", "powertrain"], dropna=False)
-            .agg(
-                n_vehicles=("id", "count"),
-                mean_travel_time_min=("travel_time_min", "mean"),
-                mean_driving_time_min=("driving_time_min", "mean"),
-                mean_distance_km=("distance_km", "mean"),
-                tailpipe_CO2_kg=("CO2_kg", "sum"),
-                indirect_CO2_kg=("indirect_CO2_kg", "sum"),
-                combined_CO2_kg=("total_CO2_kg_combined", "sum"),
-                total_energy_kWh=("energy_kWh", "sum"),
-            )
-            .reset_index()
-            .sort_values(["hub", "powertrain"])
+        hub_summary = rollup(
+            fine.xs("logistics_truck", level="vehicle_group"),
+            ["hub", "powertrain"],
+            {
+                "mean_travel_time_min": ("mean", "travel_time_min"),
+                "mean_driving_time_min": ("mean", "driving_time_min"),
+                "mean_distance_km": ("mean", "distance_km"),
+                "tailpipe_CO2_kg": ("sum", "CO2_kg"),
+                "indirect_CO2_kg": ("sum", "indirect_CO2_kg"),
+                "combined_CO2_kg": ("sum", "total_CO2_kg_combined"),
+                "total_energy_kWh": ("sum", "energy_kWh"),
+            },
         )
 
-        print("\n=== Logistics trucks by hub & powertrain ===")
-        print(hub_summary.to_string(index=False, float_format=lambda x: f"{x:,.3f}"))
+        print_summary("Logistics trucks by hub & powertrain", hub_summary)
     else:
         hub_summary = pd.DataFrame()
         print("\n(No logistics trucks found in this run.)")
@@ -279,12 +459,12 @@ def main():
     outputs_dir = Path("outputs")
     outputs_dir.mkdir(exist_ok=True)
 
-    df.to_csv(outputs_dir / "vehicles_with_emissions_and_energy.csv", index=False)
-    trucks.to_csv(outputs_dir / "logistics_trucks_detailed.csv", index=False)
-    group_summary.to_csv(outputs_dir / "summary_by_group.csv", index=False)
-    gp_pt_summary.to_csv(outputs_dir / "summary_by_group_powertrain.csv", index=False)
+    write_csv(df, outputs_dir / "vehicles_with_emissions_and_energy.csv")
+    write_csv(trucks, outputs_dir / "logistics_trucks_detailed.csv")
+    write_csv(group_summary, outputs_dir / "summary_by_group.csv")
+    write_csv(gp_pt_summary, outputs_dir / "summary_by_group_powertrain.csv")
     if not hub_summary.empty:
-        hub_summary.to_csv(outputs_dir / "summary_trucks_by_hub_powertrain.csv", index=False)
+        write_csv(hub_summary, outputs_dir / "summary_trucks_by_hub_powertrain.csv")
 
     print("\nCSV files written to the 'outputs/' folder:")
     print("  - vehicles_with_emissions_and_energy.csv")
@@ -296,4 +476,5 @@ def main():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
     main()
\ No newline at end of file
@@ -1,6 +1,27 @@
+import logging
+import os
+import sys
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from lxml import etree
 from pathlib import Path
 
+# The id-classification helpers are shared by all scenario variants and
+# live one level up (the variant folder names contain spaces, so a plain
+# path insert replaces a package import)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from analysis_helpers import (
+    GROUP_LABELS,
+    GROUP_RE,
+    HUB_LABELS,
+    HUB_RE,
+    classify_vehicle,
+    hub_from_id,
+)
+
 # ---------------------------------------------------------
 # CONFIG
 # ---------------------------------------------------------
@@ -18,49 +39,69 @@ def load_tripinfo_with_emissions(path: Path) -> pd.DataFrame:
     """
     Load tripinfo.xml and join the <emissions> child data.
     Result: one row per vehicle with travel + emissions info.
-    """
-    # one row per <tripinfo> (vehicle)
-    trip = pd.read_xml(path, xpath=".//tripinfo")
 
-    # one row per <emissions> (aligned by order with tripinfo)
-    em = pd.read_xml(path, xpath=".//emissions")
+    Streams the file with lxml's iterparse instead of parsing the
+    full tree twice with pd.read_xml; processed elements are freed
+    as we go so memory stays flat on big files.
+
+    The parsed table is cached next to the XML as Parquet, keyed by
+    the file's mtime and size, so repeated runs skip the XML parse.
+    """
+    stat = path.stat()
+    cache = path.with_suffix(f".{stat.st_mtime_ns}.{stat.st_size}.parquet")
+    if cache.exists():
+        return pd.read_parquet(cache, engine="pyarrow")
+
+    # one row per <tripinfo> (vehicle) with its inline <emissions> child
+    trip_rows = []
+    em_rows = []
+    for _, elem in etree.iterparse(str(path), events=("end",), tag="tripinfo"):
+        trip_rows.append(dict(elem.attrib))
+        em = elem.find("emissions")
+        em_rows.append(dict(em.attrib) if em is not None else {})
+        # free this element and any already-handled siblings
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+    trip = pd.DataFrame(trip_rows)
+    em = pd.DataFrame(em_rows)
 
     # join on index => each vehicle gets its emissions columns
     df = trip.join(em)
+
+    # XML attributes arrive as strings; restore numeric dtypes the way
+    # pd.read_xml would have inferred them
+    for c in df.columns:
+        converted = pd.to_numeric(df[c], errors="coerce")
+        if converted.notna().any():
+            df[c] = converted
+
+    df.to_parquet(cache, engine="pyarrow", compression="zstd")
     return df
 
 
-def classify_vehicle(veh_id: str) -> str:
-    """
-    Assign each vehicle to a group based on its id.
-    Adjust if you change your naming scheme.
-    """
-    if veh_id.startswith("T_"):
-        return "logistics_truck"
-    if veh_id.startswith("bgt_"):
-        return "background_truck"
-    if veh_id.startswith("bgc_") or veh_id.startswith("F_"):
-        return "background_car"
-    return "other"
+def write_csv(df: pd.DataFrame, path: Path) -> None:
+    """Write a DataFrame as CSV through Arrow's vectorized C++ writer
+    (much faster than DataFrame.to_csv for the big detailed tables)."""
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), str(path))
 
 
-def hub_from_id(veh_id: str) -> str:
+def print_summary(title: str, summary: pd.DataFrame) -> None:
     """
-    Map logistics truck IDs to their hub.
-    Works with current naming:
-      T_SPAR_*, T_UCS_*, T_TGW_*, T_ROS2_*, T_ROS34_*
+    Print a summary table. Float columns are formatted once per cell
+    up front (to_string's float_format lambda gets re-run during column
+    width passes) and the whole block is skipped when INFO logging is
+    disabled, so batch runs pay nothing for it.
     """
-    if veh_id.startswith("T_SPAR"):
-        return "SPAR"
-    if veh_id.startswith("T_UCS"):
-        return "UCS"
-    if veh_id.startswith("T_TGW"):
-        return "TGW"
-    if veh_id.startswith("T_ROS2"):
-        return "Roswell2"
-    if veh_id.startswith("T_ROS34"):
-        return "Roswell3&4"
-    return "other"
+    if not logging.getLogger().isEnabledFor(logging.INFO):
+        return
+    float_cols = [c for c in summary.columns if summary[c].dtype.kind == "f"]
+    fmt = summary.assign(
+        **{c: summary[c].map("{:,.3f}".format, na_action="ignore") for c in float_cols}
+    )
+    print(f"\n=== {title} ===")
+    print(fmt.to_string(index=False))
 
 
 # ---------------------------------------------------------
@@ -69,28 +110,72 @@ def hub_from_id(veh_id: str) -> str:
 def main():
     df = load_tripinfo_with_emissions(TRIPINFO_PATH)
 
-    # Basic metrics
-    df["vehicle_group"] = df["id"].apply(classify_vehicle)
-    df["distance_km"] = df["routeLength"] / 1000.0
-    df["travel_time_min"] = df["duration"] / 60.0
+    # Arrow-backed strings: groupby/startswith work on dictionary codes
+    # instead of per-cell Python objects
+    df["id"] = df["id"].astype("string[pyarrow]")
+    if "vType" in df.columns:
+        df["vType"] = df["vType"].astype("string[pyarrow]")
+
+    # Basic metrics (vectorized prefix tests instead of a per-row .apply)
+    ids = df["id"]
+    df["vehicle_group"] = (
+        ids.str.extract(GROUP_RE, expand=False)
+        .map(GROUP_LABELS)
+        .fillna("other")
+        .astype("category")
+    )
 
+    # Hub is assigned on the parent frame ("other" for non-logistics
+    # traffic) so the truck rows never need to be copied
+    df["hub"] = (
+        ids.str.extract(HUB_RE, expand=False)
+        .map(HUB_LABELS)
+        .fillna("other")
+        .astype("category")
+    )
     # Emissions & fuel:
-    # SUMO's HBEFA values are in mg; convert to g and kg
-    df["CO2_g"] = df["CO2_abs"] / 1000.0
-    df["CO2_kg"] = df["CO2_abs"] / 1_000_000.0
-    df["fuel_g"] = df["fuel_abs"] / 1000.0
-    df["fuel_kg"] = df["fuel_abs"] / 1_000_000.0
+    # SUMO's HBEFA values are in mg; coerce each raw column to a float64
+    # array exactly once and derive everything from it
+    def col(name: str) -> np.ndarray:
+        """Raw column as a float64 array (zeros when the attribute is absent)."""
+        if name in df.columns:
+            return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        return np.zeros(len(df), dtype="float64")
+
+    co2 = col("CO2_abs")
+    fuel = col("fuel_abs")
+    dur = col("duration")
+    route = col("routeLength")
+
+    dist_km = route / 1000.0
+    df["distance_km"] = dist_km
+    df["travel_time_min"] = dur / 60.0
+
+    df["CO2_g"] = co2 / 1000.0
+    df["CO2_kg"] = co2 / 1_000_000.0
+    df["fuel_g"] = fuel / 1000.0
+    df["fuel_kg"] = fuel / 1_000_000.0
 
     # Per-km metrics (watch out for 0 distance just in case)
-    df["CO2_kg_per_km"] = df["CO2_kg"] / df["distance_km"].replace(0, pd.NA)
-    df["fuel_kg_per_km"] = df["fuel_kg"] / df["distance_km"].replace(0, pd.NA)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["CO2_kg_per_km"] = np.where(dist_km > 0, co2 / 1_000_000.0 / dist_km, np.nan)
+        df["fuel_kg_per_km"] = np.where(dist_km > 0, fuel / 1_000_000.0 / dist_km, np.nan)
 
     # Service / discharge time:
     df["service_time_s"] = 0.0
     df.loc[df["vehicle_group"] == "logistics_truck", "service_time_s"] = (
         SERVICE_TIME_PER_TRUCK_S
     )
-    df["driving_time_min"] = (df["duration"] - df["service_time_s"]) / 60.0
+    df["driving_time_min"] = (dur - df["service_time_s"].to_numpy()) / 60.0
+
+    # Derived metrics easily fit in float32 (SUMO precision is far
+    # below float64); halves the bytes every later pass moves
+    num_cols = [
+        "distance_km", "travel_time_min", "driving_time_min",
+        "CO2_g", "CO2_kg", "fuel_g",
+        "fuel_kg", "CO2_kg_per_km", "fuel_kg_per_km",
+    ]
+    df[num_cols] = df[num_cols].astype("float32")
 
     # -----------------------------------------------------
     # Summary by vehicle group (logistics vs background)
@@ -109,20 +194,13 @@ def main():
         .reset_index()
     )
 
-    print("\n=== Summary by vehicle group ===")
-    print(
-        group_summary.to_string(
-            index=False, float_format=lambda x: f"{x:,.3f}"
-        )
-    )
+    print_summary("Summary by vehicle group", group_summary)
 
     # -----------------------------------------------------
     # Summary only for logistics trucks, by hub
     # -----------------------------------------------------
-    trucks = df[df["vehicle_group"] == "logistics_truck"].copy()
+    trucks = df.loc[df["vehicle_group"].eq("logistics_truck").to_numpy()]
     if not trucks.empty:
-        trucks["hub"] = trucks["id"].apply(hub_from_id)
-
         hub_summary = (
             trucks.groupby("hub")
             .agg(
@@ -137,12 +215,7 @@ def main():
             .reset_index()
         )
 
-        print("\n=== Logistics trucks by hub ===")
-        print(
-            hub_summary.to_string(
-                index=False, float_format=lambda x: f"{x:,.3f}"
-            )
-        )
+        print_summary("Logistics trucks by hub", hub_summary)
     else:
         hub_summary = pd.DataFrame()
         print("\n(No logistics trucks found in this run.)")
@@ -153,13 +226,11 @@ def main():
     outputs_dir = Path("outputs")
     outputs_dir.mkdir(exist_ok=True)
 
-    df.to_csv(outputs_dir / "vehicles_with_emissions.csv", index=False)
-    trucks.to_csv(outputs_dir / "logistics_trucks_detailed.csv", index=False)
-    group_summary.to_csv(outputs_dir / "summary_by_group.csv", index=False)
+    write_csv(df, outputs_dir / "vehicles_with_emissions.csv")
+    write_csv(trucks, outputs_dir / "logistics_trucks_detailed.csv")
+    write_csv(group_summary, outputs_dir / "summary_by_group.csv")
     if not hub_summary.empty:
-        hub_summary.to_csv(
-            outputs_dir / "summary_trucks_by_hub.csv", index=False
-        )
+        write_csv(hub_summary, outputs_dir / "summary_trucks_by_hub.csv")
 
     print("\nCSV files written to the 'outputs/' folder.")
     print("  - vehicles_with_emissions.csv")
@@ -170,4 +241,5 @@ def main():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
     main()
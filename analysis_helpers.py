@@ -0,0 +1,76 @@
+"""
+Vehicle-classification helpers shared by the scenario analysis scripts.
+
+The Baseline, Roundabout, 50-50 and Full-electrical-fleet variants all
+use the same id naming scheme (T_<HUB>_*, bgt_*, bgc_*, F_*), so the
+prefix tables and the scalar reference helpers live here instead of
+being copied into each analyze_results.py. The scripts' vectorized
+classification in main() reuses the compiled patterns and label dicts;
+the scalar helpers are cached so repeated lookups cost one dict hit.
+"""
+
+import functools
+import re
+
+import pandas as pd
+
+# Default vType ids; the scenario scripts keep their own CONFIG copies
+# for the vectorized classification in main().
+EV_TYPES = frozenset({"truck_ev"})
+DIESEL_TYPES = frozenset({"truck_euro6"})
+
+# Prefix alternations, compiled once: the regex engine scans each id a
+# single time instead of running one startswith test per prefix
+GROUP_RE = re.compile(r"^(T_|bgt_|bgc_|F_)")
+GROUP_LABELS = {
+    "T_": "logistics_truck",
+    "bgt_": "background_truck",
+    "bgc_": "background_car",
+    "F_": "background_car",
+}
+HUB_RE = re.compile(r"^T_(SPAR|UCS|TGW|ROS2|ROS34)")
+HUB_LABELS = {
+    "SPAR": "SPAR",
+    "UCS": "UCS",
+    "TGW": "TGW",
+    "ROS2": "Roswell2",
+    "ROS34": "Roswell3&4",
+}
+
+
+@functools.cache
+def classify_vehicle(veh_id: str) -> str:
+    """
+    Assign a vehicle to a group based on its id prefix.
+    """
+    m = GROUP_RE.match(veh_id)
+    return GROUP_LABELS[m.group(1)] if m else "other"
+
+
+@functools.cache
+def hub_from_id(veh_id: str) -> str:
+    """
+    Map a logistics truck id to its hub.
+    Works with current naming:
+      T_SPAR_*, T_UCS_*, T_TGW_*, T_ROS2_*, T_ROS34_*
+    """
+    m = HUB_RE.match(veh_id)
+    return HUB_LABELS[m.group(1)] if m else "other"
+
+
+@functools.cache
+def powertrain_from_vtype(vtype) -> str:
+    """
+    EV vs Diesel based on vType id.
+    """
+    if pd.isna(vtype):
+        return "unknown"
+    if vtype in EV_TYPES:
+        return "EV"
+    if vtype in DIESEL_TYPES:
+        return "Diesel"
+    # simple heuristic fallback
+    s = str(vtype).lower()
+    if "ev" in s or "electric" in s:
+        return "EV"
+    return "Other"